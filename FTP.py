@@ -3,8 +3,17 @@ import ftplib
 from ftplib import error_perm
 import json
 import os
-import tempfile
+import random
+import posixpath
 import io
+import tempfile
+import time
+import threading
+import queue
+import socket
+import ssl
+import concurrent.futures
+import functools
 
 from win32ctypes.pywin32.pywintypes import datetime
 from datetime import datetime, timedelta
@@ -12,12 +21,65 @@ from datetime import datetime, timedelta
 from Log import Log, LogFlush, LogError
 from HelpersPackage import TimestampFilename
 
+# Pull the three-digit reply code off the front of a server response, so callers can dispatch on
+# the integer instead of matching each server's exact wording with startswith chains.
+# Returns 0 for anything that doesn't begin with a code.
+def _ReplyCode(msg: str) -> int:
+    code=msg[:3]
+    return int(code) if code.isdigit() else 0
+
+
+# Raised for caller errors that leave nothing sensible to do -- e.g., asking to delete the root or
+# passing an empty filename.  These used to be "assert False", which python -O silently strips,
+# letting the program stagger on with invalid state.  A real exception type also lets callers
+# distinguish these from the error_perm replies used as ordinary flow control.
+class FTPFatalError(RuntimeError):
+    pass
+
+
+# ftplib never hands the previous control-channel TLS session back to wrap_socket, so sharing a
+# plain SSLContext across reconnects resumes nothing.  This context remembers the last session it
+# negotiated and offers it whenever the caller doesn't supply one; on a server with resumption
+# enabled that turns a reconnect's full handshake into an abbreviated one.
+class _ResumingSSLContext(ssl.SSLContext):
+    _lastSession: ssl.SSLSession=None
+
+    def wrap_socket(self, sock, **kwargs):
+        if not kwargs.get("server_side") and kwargs.get("session") is None:
+            kwargs["session"]=_ResumingSSLContext._lastSession      # May be None; that's just a full handshake
+        wrapped=super().wrap_socket(sock, **kwargs)
+        _ResumingSSLContext._lastSession=wrapped.session
+        return wrapped
+
+
+# Normalize a server path: collapse "//"s and "."/".." segments and drop any trailing "/".
+# This is pure string work, but it runs ahead of nearly every FTP operation -- usually on the same
+# handful of paths over and over -- so a small cache covers almost every call.
+@functools.lru_cache(maxsize=4096)
+def _NormPath(p: str) -> str:
+    if p == "":
+        return "/"      # Preserve the long-standing convention that "" and "/" compare equal
+    return posixpath.normpath(p.replace("//", "/"))
+
 
 class FTP:
     g_ftp: ftplib.FTP=None      # A single FTP link for all instances of the class
     g_curdirpath: str="/"
     g_credentials: dict={}      # Saves the credentials for reconnection if the server times out
     g_dologging: bool=True      # Turn on logging of useful debugging information
+    g_doverifycwd: bool=os.environ.get("FTP_VERIFY_PWD", "") != ""   # When True, CWD verifies the server's idea of the wd against ours with a PWD round trip (debugging only -- it doubles the cost of every CWD)
+    g_nlstCache: dict[str, tuple[float, set[str]]]={}    # Cached NLST listings keyed by absolute directory path: (time fetched, set of names)
+    g_nlstCacheTTL: float=30    # How long (seconds) a cached listing stays fresh
+    g_knownDirs: set[str]=set()     # Absolute paths of directories we have seen exist this session
+    g_feats: set[str]=set()     # Optional commands the server said it supports (from FEAT), refreshed on each connect
+    g_supportsSiteCopy: bool=None   # Does the server support SITE CPFR/CPTO?  None until the first copy probes it
+    g_supportsStat: bool=None   # Does the server support "STAT -l" inline listings?  None until the first listing probes it
+    g_typeBinary: bool=False    # Has TYPE I been set on this connection?  (Many servers reject SIZE in ASCII mode)
+    g_pool: queue.Queue=None    # Spare authenticated connections for transfers that shouldn't tie up g_ftp
+    g_poolsize: int=4           # Maximum number of spare connections to keep open
+    g_blocksize: int=1<<20      # Transfer chunk size for storbinary/retrbinary (ftplib's 8 KB default starves fast links)
+    g_reconnectDelay: float=0.5     # Current reconnect back-off ceiling (seconds); doubles per failed connect, resets on success
+    g_sslcontext: ssl.SSLContext=None   # One shared TLS context for all connections, so its session cache can speed up reconnects
     _lastMessage: str=""         # Holds the last error message
 
 
@@ -49,8 +111,9 @@ class FTP:
     # A special Log which only writes when FTP has logging turned on.
     # Used for debugging messages, b not error messages
     def Log(self, s: str, noNewLine=False):
-        if FTP.g_dologging:
-            Log(s, noNewLine)
+        if not FTP.g_dologging:     # Bail before doing any work when logging is off -- this is on every hot path
+            return
+        Log(s, noNewLine)
 
 
     def LoggingOff(self):
@@ -68,17 +131,84 @@ class FTP:
     # If we get a connection failure, reconnect tries to re-establish the connection and put the FTP object into a consistent state and then to restore the CWD
     def Reconnect(self) -> bool:
         FTP._lastMessage=""   # Clear the last essage
+        FTP.g_nlstCache.clear()     # The server's state may have changed while we were away
+        FTP.g_knownDirs.clear()     # ...and that goes for the directories we'd seen exist, too
         self.Log("Reconnect attempted")
         if len(FTP.g_credentials) == 0:
             return False
-        FTP.g_ftp=ftplib.FTP_TLS(host=FTP.g_credentials["host"], user=FTP.GetEditor(), passwd=FTP.g_credentials["PW"])
+
+        # If the existing control connection is actually still alive -- e.g., the failure was on the
+        # data channel or elsewhere -- a NOOP proves it for one round trip and we keep the session
+        # rather than paying for a fresh TLS handshake and login.
+        if FTP.g_ftp is not None:
+            try:
+                FTP.g_ftp.voidcmd("NOOP")
+                self.Log("Reconnect: existing connection still alive; keeping it")
+                FTP.g_reconnectDelay=0.5    # The link is healthy; the next outage starts its back-off from scratch
+                return True
+            except Exception:
+                pass    # Really dead; fall through and rebuild it
+
+        # Geometric back-off with jitter on the rebuild: when the server or network is struggling,
+        # hammering it with an immediate full TLS handshake per failing call adds congestion at
+        # exactly the wrong moment.  Sleeping a random fraction of the ceiling also keeps several
+        # processes from retrying in lockstep.
+        for attempt in range(5):
+            try:
+                FTP.g_ftp=ftplib.FTP_TLS(host=FTP.g_credentials["host"], user=FTP.GetEditor(), passwd=FTP.g_credentials["PW"], context=self._SslContext())
+                break
+            except Exception as e:
+                self.Log(f"Reconnect: connect failed ({e}); retrying in up to {FTP.g_reconnectDelay:.1f}s")
+                time.sleep(random.uniform(0, FTP.g_reconnectDelay))
+                FTP.g_reconnectDelay=min(FTP.g_reconnectDelay*2, 30)
+        else:
+            Log("***FTP.Reconnect failed: could not connect")
+            return False
+        FTP.g_reconnectDelay=0.5    # Connected; the next outage starts its back-off from scratch
         FTP.g_ftp.prot_p()
 
+        # Lift the kernel socket buffers past their default so the TCP window can grow to fill
+        # high bandwidth-delay links; without this the window caps out around 200 KB.
+        # TCP keep-alives stop NAT boxes and idle-timeout firewalls from silently dropping the
+        # control connection between bursts of work.
+        try:
+            FTP.g_ftp.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4<<20)
+            FTP.g_ftp.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4<<20)
+            FTP.g_ftp.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"):     # Linux-only names; Windows gets plain SO_KEEPALIVE
+                FTP.g_ftp.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
+                FTP.g_ftp.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 30)
+        except OSError as e:
+            self.Log(f"Reconnect: could not set socket options: {e}")
+
+        # Ask once what optional commands this server supports, so the methods which can use them (e.g., MLST)
+        # don't have to pay a failed-probe round trip on servers which can't.
+        try:
+            FTP.g_feats={line.strip().split(" ")[0].upper() for line in self.g_ftp.sendcmd("FEAT").split("\n")[1:-1]}
+        except Exception:
+            FTP.g_feats=set()
+        self.Log(f"Reconnect: server features: {sorted(FTP.g_feats)}")
+
+        # Trim MLSD/MLST replies down to the facts we actually use.  Servers default to sending
+        # modify timestamps, permissions, etc. with every entry; on big directories that's most of
+        # the listing payload.
+        if "MLST" in FTP.g_feats:
+            try:
+                self.g_ftp.sendcmd("OPTS MLST type;size;")
+            except Exception as e:
+                self.Log(f"Reconnect: OPTS MLST rejected: {e}")
+
+        # The one-shot capability probes (SITE CPFR/CPTO, STAT -l) belong to a connection, so a fresh
+        # connection gets to probe them afresh.
+        FTP.g_supportsSiteCopy=None
+        FTP.g_supportsStat=None
+        FTP.g_typeBinary=False
+
         # Now we need to restore the current working directory
         self.Log("Reconnect: g_ftp.cwd('/')")
         msg=self.g_ftp.cwd("/")
         self.Log(msg)
-        ret=msg.startswith("250 OK.")
+        ret=_ReplyCode(msg) == 250
         if not ret:
             Log("***FTP.Reconnect failed")
             return False
@@ -88,29 +218,141 @@ class FTP:
         FTP.g_curdirpath="/"
         self.SetDirectory(olddir)
 
+        # One consistency check per reconnect: make sure the server's idea of the wd matches ours.
+        # (CWD itself no longer verifies on every call -- that doubled its cost.)
+        self.PWD()
+
         return True
 
 
+    # ---------------------------------------------
+    # Issue a NOOP to keep the control connection from idling out.  Long-running callers can call
+    # this between bursts of work (every minute or so is plenty); it costs one round trip.
+    def KeepAlive(self) -> bool:
+        if FTP.g_ftp is None:
+            return False
+        try:
+            FTP.g_ftp.voidcmd("NOOP")
+            return True
+        except Exception as e:
+            self.Log(f"KeepAlive(): NOOP failed. Exception={e}")
+            return False
+
+
+    # ---------------------------------------------
+    # All connections share one TLS context, which stashes each negotiated session and offers it
+    # to the next handshake (see _ResumingSSLContext) so a reconnect can resume the previous
+    # session rather than paying for a full handshake.
+    def _SslContext(self) -> ssl.SSLContext:
+        if FTP.g_sslcontext is None:
+            FTP.g_sslcontext=_ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            # Match ftplib's historical default so servers with self-signed certificates keep working
+            FTP.g_sslcontext.check_hostname=False
+            FTP.g_sslcontext.verify_mode=ssl.CERT_NONE
+        return FTP.g_sslcontext
+
+
+    # ---------------------------------------------
+    # Open a brand-new, independent, authenticated connection using the saved credentials.
+    # Everything routed through g_ftp serializes on one socket; transfers that can run side-by-side
+    # (or that shouldn't disturb g_ftp's working directory) use one of these instead.
+    def _NewConnection(self) -> ftplib.FTP_TLS|None:
+        if len(FTP.g_credentials) == 0:
+            return None
+        try:
+            ftp=ftplib.FTP_TLS(host=FTP.g_credentials["host"], user=FTP.UserID(), passwd=FTP.g_credentials["PW"], context=self._SslContext())
+            ftp.prot_p()
+            return ftp
+        except Exception as e:
+            Log(f"FTP._NewConnection(): could not open a new connection. Exception={e}")
+            return None
+
+
+    # ---------------------------------------------
+    # Borrow a spare connection from the pool, opening a fresh one if the pool is empty or the
+    # borrowed one has gone stale.  Pair every call with _ReleaseConnection.
+    def _AcquireConnection(self) -> ftplib.FTP_TLS|None:
+        if FTP.g_pool is None:
+            FTP.g_pool=queue.Queue(FTP.g_poolsize)
+        try:
+            ftp=FTP.g_pool.get_nowait()
+        except queue.Empty:
+            return self._NewConnection()
+        try:
+            ftp.voidcmd("NOOP")     # Make sure the borrowed connection is still alive
+            return ftp
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+            return self._NewConnection()
+
+
+    # Return a borrowed connection to the pool; if the pool is already full, close it instead.
+    def _ReleaseConnection(self, ftp: ftplib.FTP_TLS) -> None:
+        if ftp is None:
+            return
+        if FTP.g_pool is None:
+            FTP.g_pool=queue.Queue(FTP.g_poolsize)
+        try:
+            FTP.g_pool.put_nowait(ftp)
+        except queue.Full:
+            try:
+                ftp.quit()
+            except Exception:
+                ftp.close()
+
+
+    # ---------------------------------------------
+    # Close every idle pooled connection.  Call this when a long-running program is done with its
+    # bulk work so idle sockets aren't left holding server connection slots.
+    def ClosePool(self) -> None:
+        if FTP.g_pool is None:
+            return
+        while True:
+            try:
+                ftp=FTP.g_pool.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                ftp.quit()
+            except Exception:
+                ftp.close()
+
+
+    # ---------------------------------------------
+    # Run one server call, reconnecting and retrying with exponential backoff when it fails.
+    # Transient network errors usually heal themselves within seconds, so rather than giving up after a
+    # single reconnect we sleep min(2**attempt, 30) seconds between tries.
+    # An error_perm reply is an answer from the server, not a connection failure, so it propagates at once;
+    # if every attempt fails the last exception is raised.
+    def _WithRetry(self, fn, retries: int=5):
+        for attempt in range(retries):
+            try:
+                return fn()
+            except error_perm:
+                raise
+            except ftplib.all_errors as e:      # Narrow: a bug (TypeError etc.) should not be retried and slept on
+                if attempt == retries-1:
+                    raise
+                self.Log(f"FTP._WithRetry(): attempt {attempt+1} failed ({e}); reconnecting")
+                time.sleep(min(2**attempt, 30))
+                self.Reconnect()
+
+
     # ---------------------------------------------
     # Update the saved current working directory path
-    # If the input is an absolute path, just use it (removing any trailing filename)
-    # If it's a relative move, compute the new wd path
+    # If the input is an absolute path, just use it (normalized)
+    # If it's a relative move, compute the new wd path.  Chains like "../.." and multi-component
+    # descents like "a/b" are handled by posixpath.normpath, which also collapses any "//"s.
     def UpdateCurpath(self, newdir: str) -> None:
-        newdir=newdir.replace("//", "/")
-        self.Log(f"UpdateCurpath('{newdir}') ...from {FTP.g_curdirpath}")
-        if newdir[0] == "/":    # Absolute directory move
-            FTP.g_curdirpath=newdir
-        elif newdir == "..":    # Relative move up one directory
-            #TODO: Note that we don't handle things like "../.." yet
-            if FTP.g_curdirpath != "/":     # If we're already at the top, we stay put.
-                head, _=os.path.split(FTP.g_curdirpath)    # But we're not, so we slice off the last directory in the saved wd path
-                FTP.g_curdirpath=head
+        if FTP.g_dologging:     # Don't even build the string on this hot path when logging is off
+            self.Log(f"UpdateCurpath('{newdir}') ...from {FTP.g_curdirpath}")
+        if posixpath.isabs(newdir):    # Absolute directory move
+            FTP.g_curdirpath=_NormPath(newdir)
         else:
-            # What's left is a CD downwards
-            if FTP.g_curdirpath == "/":
-                FTP.g_curdirpath+=newdir
-            else:
-                FTP.g_curdirpath+="/"+newdir
+            FTP.g_curdirpath=_NormPath(posixpath.join(FTP.g_curdirpath, newdir))
 
 
     def GetCurPath(self) -> str:
@@ -120,29 +362,26 @@ class FTP:
     # Given a full path "/xxx/yyy/zzz" or a single child directory thisrow (no slashes), change to that directory
     def CWD(self, newdir: str) -> bool:
         newdir=newdir.replace("//", "/")
-        wd=self.PWD()
-        if wd == newdir or wd+"/" == newdir:
-            self.Log(f"CWD('{newdir}') from '{wd}' so already there")
+        # Use the locally-cached wd rather than asking the server (PWD is a round trip and the cache is authoritative)
+        wd=FTP.g_curdirpath
+        if self.ComparePaths(wd, newdir):
+            if FTP.g_dologging:     # Don't even build the string on this hot path when logging is off
+                self.Log(f"CWD('{newdir}') from '{wd}' so already there")
             return True
 
-        msg=""
         try:
-            msg=self.g_ftp.cwd(newdir)
+            msg=self._WithRetry(lambda: self.g_ftp.cwd(newdir))
         except Exception as e:
-            self.Log(f"***FTP.CWD(): FTP connection failure. Exception={e}")
-            if not self.Reconnect():
-                return False
-            try:
-                msg=self.g_ftp.cwd(newdir)
-            except Exception as e:
-                self.Log(f"***g_ftp.cwd('{newdir}'): FTP connection failure. Exception={e}")
-                return False
+            self.Log(f"***FTP.CWD('{newdir}'): failed. Exception={e}")
+            return False
 
         self.Log(msg)
-        ret=msg.startswith("250 OK.")
+        ret=_ReplyCode(msg) == 250
         if ret:
             self.UpdateCurpath(newdir)
-        self.PWD()
+            FTP.g_knownDirs.add(FTP.g_curdirpath)   # A successful CWD proves the directory exists
+        if FTP.g_doverifycwd:
+            self.PWD()      # Ask the server where we are and compare it with where we think we are
         return ret
 
 
@@ -151,14 +390,15 @@ class FTP:
     def MKD(self, newdir: str) -> bool:
         self.Log("**make directory: '"+newdir+"'")
         try:
-            msg=self.g_ftp.mkd(newdir)
+            msg=self._WithRetry(lambda: self.g_ftp.mkd(newdir))
         except Exception as e:
-            Log("FTP.MKD(): FTP connection failure. Exception="+str(e))
-            if not self.Reconnect():
-                return False
-            msg=self.g_ftp.mkd(newdir)
+            Log("FTP.MKD(): mkd failed. Exception="+str(e))
+            return False
         self.Log(msg+"\n")
-        return msg == newdir or msg.startswith("250 ") or msg.startswith("257 ")     # Web doc shows all three as possible.
+        ret=msg == newdir or _ReplyCode(msg) in (250, 257)     # Web doc shows all three as possible.
+        if ret:
+            self._NlstCacheAdd(newdir)
+        return ret
 
 
     # ---------------------------------------------
@@ -168,21 +408,66 @@ class FTP:
         if len(fname.strip()) == 0:
             Log("FTP.DeleteFile(): filename not supplied.")
             LogFlush()
-            assert False
+            raise FTPFatalError("FTP.DeleteFile(): filename not supplied")
 
-        if not self.FileExists(fname):
-            Log("FTP.DeleteFile: '"+fname+"' does not exist.")
+        # No pre-flight existence check: that costs a listing round trip, and the server's 550 reply
+        # tells us the same thing.  Deleting a file which isn't there counts as success.
+        try:
+            msg=self._WithRetry(lambda: self.g_ftp.delete(fname))
+        except error_perm as e:
+            if str(e).startswith("550"):
+                Log("FTP.DeleteFile: '"+fname+"' does not exist.")
+                return True
+            Log(f"FTP.DeleteFile(): delete failed. Exception={e}")
+            return False
+        except Exception as e:
+            Log(f"FTP.DeleteFile(): delete failed. Exception={e}")
+            return False
+        self.Log(msg+"\n")
+        self._NlstCacheRemove(fname)
+        return _ReplyCode(msg) == 250
+
+
+    # ---------------------------------------------
+    # Delete a batch of files in the current directory.
+    # For callers which have already enumerated the directory, this skips all per-file ceremony:
+    # names which a fresh cached listing says aren't there are dropped without touching the server,
+    # and the rest go out as one pipelined batch of DELEs costing roughly a single round trip.
+    def DeleteFiles(self, fnames: list[str]) -> bool:
+        FTP._lastMessage=""   # Clear the last message
+        fnames=[fname for fname in fnames if len(fname.strip()) > 0]
+        if len(fnames) == 0:
             return True
+        self.Log(f"**delete {len(fnames)} files: {fnames}")
+
+        # If we have a fresh listing of the current directory, use it to drop names which aren't
+        # there.  (Deleting a missing file counts as success, same as DeleteFile.)
+        cached=FTP.g_nlstCache.get(FTP.g_curdirpath)
+        if cached is not None and time.time()-cached[0] < FTP.g_nlstCacheTTL:
+            fnames=[fname for fname in fnames if fname in cached[1]]
+            if len(fnames) == 0:
+                return True
 
         try:
-            msg=self.g_ftp.delete(fname)
+            deleted=self._PipelineDele(fnames)
         except Exception as e:
-            Log("FTP connection failure. Exception="+str(e))
+            self.Log(f"FTP.DeleteFiles(): pipelined delete failed. Exception={e}")
+            # The control channel may still hold unread DELE replies which would pair up with the
+            # fallback's own commands, so the connection can't be trusted -- rebuild it first.
+            try:
+                self.g_ftp.close()
+            except Exception:
+                pass
             if not self.Reconnect():
                 return False
-            msg=self.g_ftp.delete(fname)
-        self.Log(msg+"\n")
-        return msg.startswith("250 ")
+            deleted=False
+        if not deleted:
+            # Something odd came back; retry one at a time so each file gets DeleteFile's error handling
+            return all([self.DeleteFile(fname) for fname in fnames])
+
+        for fname in fnames:
+            self._NlstCacheRemove(fname)
+        return True
 
 
     # ---------------------------------------------
@@ -190,27 +475,31 @@ class FTP:
         FTP._lastMessage=""   # Clear the last message
         self.Log(f"**rename file: '{oldname}'  as  '{newname}'")
         if len(oldname.strip()) == 0 or len(newname.strip()) == 0:
-            Log("FTP.Rename(): oldname or newname not supplied. Probably irrecoverable, so exiting program.")
+            Log("FTP.Rename(): oldname or newname not supplied. Probably irrecoverable.")
             LogFlush()
-            assert False
-
-        if not self.FileExists(oldname):
-            msg=f"FTP.Rename: '{oldname}' does not exist."
-            FTP._lastMessage=msg
-            Log(msg)
-            return False
+            raise FTPFatalError("FTP.Rename(): oldname or newname not supplied")
 
+        # No pre-flight existence check: the server's 550 reply for a missing file tells us the
+        # same thing without the extra listing round trip.
         try:
-            msg=self.g_ftp.rename(oldname, newname)
+            msg=self._WithRetry(lambda: self.g_ftp.rename(oldname, newname))
             FTP._lastMessage=msg
-        except Exception as e:
-            Log(f"FTP.Rename: FTP connection failure. Exception={e}")
-            if not self.Reconnect():
+        except error_perm as e:
+            if str(e).startswith("550"):
+                msg=f"FTP.Rename: '{oldname}' does not exist."
+                FTP._lastMessage=msg
+                Log(msg)
                 return False
-            msg=self.g_ftp.rename(oldname, newname)
-            FTP._lastMessage=msg
+            Log(f"FTP.Rename: rename failed. Exception={e}")
+            return False
+        except Exception as e:
+            Log(f"FTP.Rename: rename failed. Exception={e}")
+            return False
         self.Log(msg+"\n")
-        return msg.startswith("250 ")
+        self._NlstCacheRemove(oldname)
+        self._NlstCacheAdd(newname)
+        FTP.g_knownDirs.clear()     # Cheap and safe: the renamed item may have been a directory
+        return _ReplyCode(msg) == 250
 
 
     # ---------------------------------------------
@@ -222,66 +511,102 @@ class FTP:
         if len(dirname.strip()) == 0:
             Log("FTP.DeleteDir(): dirname not supplied.")
             LogFlush()
-            assert False        # This should never happen.
+            raise FTPFatalError("FTP.DeleteDir(): dirname not supplied")
         if dirname == "/":
             Log("FTP.DeleteDir(): Attempt to delete root -- forbidden")
-            assert False
+            raise FTPFatalError("FTP.DeleteDir(): attempt to delete root")
 
         if not self.FileExists(dirname):
             Log(f"FTP.DeleteDir(): '{dirname}' does not exist.")
             return True
 
         # The first step is to delete any files it contains
-        files=self.Nlst(dirname)
-        for file in files:
-            self.DeleteFile(file)
+        # The names came straight from the server's own listing, so we skip DeleteFile's per-file existence
+        # check and pipeline the DELEs; if anything odd comes back we fall back to deleting one at a time.
+        # Where the server gave us MLSD facts, skip subdirectories outright instead of letting their
+        # DELEs fail (their contents must be deleted first anyway).
+        files=[name for name, facts in self.Mlsd(dirname) if facts.get("type", "file") not in ("dir", "cdir", "pdir")]
+        if len(files) > 0:
+            try:
+                deleted=self._PipelineDele(files)
+            except Exception as e:
+                self.Log(f"DeleteDir('{dirname}'): pipelined delete failed. Exception={e}")
+                # The control channel may still hold unread DELE replies which would pair up with
+                # the fallback's own commands, so the connection can't be trusted -- rebuild it first.
+                try:
+                    self.g_ftp.close()
+                except Exception:
+                    pass
+                if not self.Reconnect():
+                    return False
+                deleted=False
+            if not deleted:
+                for file in files:
+                    self.DeleteFile(file)
+            self._FlushNlstCache()
 
         try:
-            msg=self.g_ftp.rmd(dirname)
+            msg=self._WithRetry(lambda: self.g_ftp.rmd(dirname))
             FTP._lastMessage=msg
         except Exception as e:
-            Log(f"FTP.DeleteDir(): FTP connection failure. Exception={e}")
-            if not self.Reconnect():
-                return False
-            msg=self.g_ftp.rmd(dirname)
-            FTP._lastMessage=msg
+            Log(f"FTP.DeleteDir(): rmd failed. Exception={e}")
+            return False
 
         self.Log(msg+"\n")
-        return msg.startswith("250 ")
+        # Drop the deleted directory's own cached listing and take its name out of its parent's --
+        # the cache is keyed by absolute paths, so resolve a relative dirname against the wd first.
+        abspath=_NormPath(dirname if posixpath.isabs(dirname) else posixpath.join(FTP.g_curdirpath, dirname))
+        FTP.g_nlstCache.pop(abspath, None)
+        parent, base=posixpath.split(abspath)
+        entry=FTP.g_nlstCache.get(parent)
+        if entry is not None:
+            entry[1].discard(base)
+        FTP.g_knownDirs.clear()     # Cheap and safe: one of the known directories is gone
+        return _ReplyCode(msg) == 250
+
+
+    # ---------------------------------------------
+    # Delete a batch of files in the current directory by pipelining the DELE commands: send them all
+    # back-to-back and only then read the replies, so the whole batch costs roughly one round trip
+    # rather than one per file.
+    # Returns True if every reply was a 250; on False the caller should retry the slow way.
+    def _PipelineDele(self, files: list[str]) -> bool:
+        for file in files:
+            self.g_ftp.putcmd("DELE "+file)
+        ok=True
+        for file in files:
+            msg=self.g_ftp.getmultiline()
+            self.Log(f"DELE {file}: {msg}")
+            if _ReplyCode(msg) != 250:
+                ok=False
+        return ok
 
 
     #----------------------------------------------
     # Compare two paths for equality.  We ignore differences in trailing "/"
     def ComparePaths(self, p1: str, p2: str) -> bool:
-        p1=p1.replace("//", "/")
-        p2=p2.replace("//", "/")
-        # Make sure that there is a trailing "/" before comparing
-        if len(p1) == 0 or p1[-1] != "/":
-            p1+="/"
-        if len(p2) == 0 or p2[-1] != "/":
-            p2+="/"
-        return p1 == p2
+        return _NormPath(p1) == _NormPath(p2)
 
 
     # ---------------------------------------------
     # Returns the full path to the current directory as a string
     def PWD(self) -> str:
         try:
-            dir=self.g_ftp.pwd()
+            dir=self._WithRetry(lambda: self.g_ftp.pwd())
         except Exception as e:
-            Log("PWD(): FTP connection failure. Exception="+str(e))
-            if not self.Reconnect():
-                return ""
-            dir=self.g_ftp.pwd()
+            Log("PWD(): pwd failed. Exception="+str(e))
+            return ""
         self.Log("PWD() --> '"+dir+"'")
 
         # Check to see if this matches what self._curdirpath thinks it ought to
-        lead, tail=os.path.split(FTP.g_curdirpath)
-        self.Log(f"PWD(): {lead=}  {tail=}")
+        if FTP.g_dologging:     # Only do the split (and build the string) when it will actually be logged
+            lead, tail=posixpath.split(FTP.g_curdirpath)    # These are server paths, so never use the host OS's path rules on them
+            self.Log(f"PWD(): {lead=}  {tail=}")
         if not self.ComparePaths(FTP.g_curdirpath,  dir):
+            # The server is authoritative, so log the drift and re-sync rather than aborting the program
             Log(f"***PWD(): error detected -- self._curdirpath='{FTP.g_curdirpath}' and pwd returns '{dir}'")
-            Log("***Probably irrecoverable, so exiting program.")
-            assert False
+            Log("***Re-syncing g_curdirpath to the server's answer.")
+            FTP.g_curdirpath=dir
 
         return dir
 
@@ -290,35 +615,106 @@ class FTP:
     # Given a complete path of the form "/xxx/yyy/zzz" (note leading "/"and no trailing "/"), or a relative path of the form "xxx" (note no slashes) does it exist?
     def PathExists(self, dirPath: str) -> bool:
         FTP._lastMessage=""  # Clear the last message
-        FTP._lastMessage=""   # Clear the last message
-        dirPath=dirPath.replace("//", "/")
-
         dirPath=dirPath.strip()
         if len(dirPath) == 0:
             return False
+        dirPath=_NormPath(dirPath)
+        if dirPath == "/":
+            return True     # Root always exists
 
-        # Handle the case where we're looking at "/xxx", a folder at root level.
-        if dirPath[0] == "/":
-            if not self.CWD("/"):
+        # When the server supports MLST, one command answers the question for the whole path at
+        # once -- no CWD and no listing, however deep the path goes.
+        if "MLST" in FTP.g_feats:
+            try:
+                self._WithRetry(lambda: self.g_ftp.sendcmd("MLST "+dirPath))
+                self.Log(f"PathExists('{dirPath}') --> yes (MLST)")
+                return True
+            except error_perm:
+                self.Log(f"PathExists('{dirPath}') --> no (MLST)")
+                return False
+            except Exception as e:
+                self.Log(f"PathExists('{dirPath}'): MLST failed ({e}); falling back to the walk")
+
+        rest, end=posixpath.split(dirPath)    # The parent directory and the name to look for
+
+        # A bare relative name gets checked in the current directory -- no CWD at all.
+        # (The old code split a slashless path into a one-element list and then CWDed to "".)
+        if rest == "":
+            return self.FileExists(end)
+
+        # Skip the CWD round trip when we're already sitting in the parent directory
+        if not self.ComparePaths(rest, FTP.g_curdirpath):
+            if not self.CWD(rest):
                 return False
-            if dirPath[1:] == "":
-                return True     # We asked for "/" with no file, so no need to check for file
-            return self.FileExists(dirPath[1:])
-
-        # Now deal with more complex paths
-        path=dirPath.split("/")
-        if len(path) == 0:
-            return self.FileExists(dirPath)
-
-        end=path[-1]    # The last element of the path
-        rest="/".join(path[:-1])    # The beginning of the path
-        if len(rest) > 0:
-            self.CWD(rest)
-        if end == "":
-            return True
         return self.FileExists(end)
 
 
+    # ---------------------------------------------
+    # Fetch the names in the current directory without opening a data connection at all: "STAT -l ."
+    # returns the listing inline on the control channel, saving the PASV exchange and TCP handshake
+    # that an NLST needs.  Returns None if the server can't do it (or the output can't be parsed),
+    # and remembers a rejection so we only probe once per session.
+    def _StatListing(self) -> set[str]|None:
+        if FTP.g_supportsStat is False:
+            return None
+        try:
+            resp=self.g_ftp.sendcmd("STAT -l .")
+        except Exception as e:
+            if FTP.g_supportsStat is None and str(e)[:3] in ("500", "502"):
+                FTP.g_supportsStat=False    # The server doesn't know the command; don't probe again
+            self.Log(f"_StatListing(): failed ({e})")
+            return None
+        names=set()
+        for line in resp.split("\n")[1:-1]:     # Skip the 211- header and the 211 trailer
+            if line.startswith("total "):
+                continue        # Some servers open the listing with ls's "total N" header
+            parts=line.split(None, 8)   # Standard ls -l format: the 9th field is the name (which may contain spaces)
+            if len(parts) < 9:
+                self.Log(f"_StatListing(): unparseable line '{line}'")
+                FTP.g_supportsStat=False    # Whatever this server inlines, we can't read it -- stop paying for the probe
+                return None     # Play it safe and let the caller fall back to NLST
+            name=parts[8].split(" -> ", 1)[0]   # A symlink lists as "name -> target"; only the name exists here
+            if name not in (".", ".."):
+                names.add(name)
+        FTP.g_supportsStat=True
+        return names
+
+    # ---------------------------------------------
+    # Return the NLST listing of the current working directory, using a cached copy when we have a fresh one.
+    # An NLST is a full round trip plus a data-channel open, so the cache saves a lot on repeated probes of the same directory.
+    def _CachedNlst(self) -> set[str]:
+        entry=FTP.g_nlstCache.get(FTP.g_curdirpath)
+        if entry is not None and time.time()-entry[0] < FTP.g_nlstCacheTTL:
+            return entry[1]
+        listing=self._StatListing()     # The inline listing is cheaper when the server offers it
+        if listing is None:
+            FTP.g_typeBinary=False      # nlst rides on retrlines, which quietly switches the connection to TYPE A
+            listing=set(self.g_ftp.nlst())
+        FTP.g_nlstCache[FTP.g_curdirpath]=(time.time(), listing)
+        return listing
+
+    # Drop the cached listing for a directory (by default the current directory) because we just changed its contents
+    def _FlushNlstCache(self, path: str=None) -> None:
+        # The cache is keyed by normalized absolute paths, so a caller-supplied path has to be
+        # resolved the same way or the pop silently misses the entry it was meant to drop.
+        if path is None:
+            path=FTP.g_curdirpath
+        elif not posixpath.isabs(path):
+            path=posixpath.join(FTP.g_curdirpath, path)
+        FTP.g_nlstCache.pop(_NormPath(path), None)
+
+    # When we just made a mutation ourselves we know exactly how the listing changed, so keep the
+    # cached set in step instead of throwing it away and paying for a fresh listing on the next probe.
+    def _NlstCacheAdd(self, name: str) -> None:
+        entry=FTP.g_nlstCache.get(FTP.g_curdirpath)
+        if entry is not None:
+            entry[1].add(name)
+
+    def _NlstCacheRemove(self, name: str) -> None:
+        entry=FTP.g_nlstCache.get(FTP.g_curdirpath)
+        if entry is not None:
+            entry[1].discard(name)
+
     # ---------------------------------------------
     # Given a filename (possibly includeing a complete path), does the file exist.  Note that a directory is treated as a file.
     def FileExists(self, filedir: str) -> bool:
@@ -331,11 +727,8 @@ class FTP:
         if filedir[-1] == "/":
             filedir=filedir[:-1]
 
-        # Split the filedir into path+file
-        path=""
-        if "/" in filedir:
-            path="/".join(filedir.split("/")[:-1])
-            filedir=filedir.split("/")[-1]
+        # Split the filedir into path+file with a single scan rather than splitting it twice
+        path, _, filedir=filedir.rpartition("/")
 
         # Make sure we're at the path
         if len(path) > 0:
@@ -344,17 +737,42 @@ class FTP:
                 return False
             self.CWD(path)
 
+        # When the server supports it, probe the one name directly -- a single control-channel reply with no
+        # data connection at all -- rather than pulling the whole directory listing just to test membership.
+        if "MLST" in FTP.g_feats:
+            try:
+                self.g_ftp.sendcmd("MLST "+filedir)
+                self.Log(f"FileExists('{filedir}') --> yes (MLST)")
+                return True
+            except error_perm:
+                self.Log(f"FileExists('{filedir}') --> no (MLST)")
+                return False
+            except Exception as e:
+                self.Log(f"FileExists('{filedir}'): MLST failed ({e}); falling back to NLST")
+        elif "SIZE" in FTP.g_feats:
+            try:
+                if not FTP.g_typeBinary:
+                    self.g_ftp.voidcmd("TYPE I")    # Many servers refuse SIZE in ASCII mode
+                    FTP.g_typeBinary=True
+                self.g_ftp.sendcmd("SIZE "+filedir)
+                self.Log(f"FileExists('{filedir}') --> yes (SIZE)")
+                return True
+            except error_perm:
+                pass    # SIZE fails both for missing names and for directories, so we must fall through to the listing
+            except Exception as e:
+                self.Log(f"FileExists('{filedir}'): SIZE failed ({e}); falling back to NLST")
+
         try:
-            if filedir in self.g_ftp.nlst():
-                self.Log(f"FileExists('{filedir}') --> yes")
+            if filedir in self._WithRetry(self._CachedNlst):
+                if FTP.g_dologging:
+                    self.Log(f"FileExists('{filedir}') --> yes")
                 return True
-            self.Log(f"FileExists('{filedir}') --> no, it does not exist")
+            if FTP.g_dologging:
+                self.Log(f"FileExists('{filedir}') --> no, it does not exist")
+            return False
+        except Exception as e:
+            Log(f"FTP.FileExists(): listing failed. Exception={e}")
             return False
-        except:
-            Log("'FTP.FileExists(): FTP failure: retrying")
-            if not self.Reconnect():
-                return False
-            return self.FileExists(filedir)
 
 
     #-------------------------------
@@ -370,30 +788,56 @@ class FTP:
             return True
 
         # If we've been given an absolute path, and we're already there, return
-        if newdir[0] == "/" and newdir == self.g_curdirpath:
+        if posixpath.isabs(newdir) and newdir == self.g_curdirpath:
             self.Log("SetDirectory: already there with an absolute path")
             return True
 
-        components=[]
-        if newdir[0] == "/":
-            components.append("/")
-            newdir=newdir[1:]
-        components.extend(newdir.split("/"))
-        components=[c.strip() for c in components if len(c) > 0]
-
-        # Now walk the component list
-        for component in components:
-            # Does the directory exist?
-            if not self.FileExists(component):
-                # If not, are we allowed to create it"
-                if not Create:
-                    Log("***FTP.SetDirectory(): called for a non-existent directory with create=False")
-                    return False
-                if not self.MKD(component):
-                    Log("***FTP.SetDirectory(): mkd failed...bailing out...")
-                    return False
+        # If we've already seen this directory exist in this session, a single CWD gets us there --
+        # no need to walk and probe the components again, even when Create=True.
+        if posixpath.isabs(newdir) and _NormPath(newdir) in FTP.g_knownDirs:
+            if self.CWD(newdir):
+                return True
+            # The entry was stale -- the directory has gone away since we saw it -- so forget it
+            # and take the ordinary path below, which can recreate it when Create=True.
+            FTP.g_knownDirs.discard(_NormPath(newdir))
+
+        # When we aren't being asked to create anything, the whole move can be a single CWD: now that
+        # UpdateCurpath understands multi-component moves there's no need to probe and walk one
+        # component at a time.
+        if not Create:
+            if self.CWD(newdir):
+                return True
+            Log("***FTP.SetDirectory(): called for a non-existent directory with create=False")
+            return False
 
-            # Now cwd to it.
+        # Create=True.  Even so, in the common case the whole chain already exists, so try the
+        # one-CWD move first and only walk the path when that fails.
+        if self.CWD(newdir):
+            return True
+
+        # Some tail of the path is missing.  Find the deepest ancestor which does exist by trying
+        # CWD from the target upward -- CWD doubles as the existence test, so this costs one round
+        # trip per missing level rather than a listing probe per level like the old component walk.
+        if not posixpath.isabs(newdir):
+            newdir=posixpath.join(FTP.g_curdirpath, newdir)
+        newdir=_NormPath(newdir)
+        missing=[]      # The components still to be created, deepest first
+        ancestor=newdir
+        while ancestor != "/":
+            ancestor, end=posixpath.split(ancestor)
+            missing.append(end)
+            if self.CWD(ancestor):
+                break
+        else:
+            if not self.CWD("/"):
+                Log("***FTP.SetDirectory(): cwd failed...bailing out...")
+                return False
+
+        # We're sitting in the deepest existing ancestor; create and enter the missing tail in order
+        for component in reversed(missing):
+            if not self.MKD(component):
+                Log("***FTP.SetDirectory(): mkd failed...bailing out...")
+                return False
             if not self.CWD(component):
                 Log("***FTP.SetDirectory(): cwd failed...bailing out...")
                 return False
@@ -409,21 +853,20 @@ class FTP:
             Log("FTP.PutString(): FTP not initialized")
             return False
 
-        with tempfile.TemporaryFile() as f:
+        # Wrap the string in an in-memory buffer -- no need to round-trip it through the disk
+        f=io.BytesIO(s.encode("utf-8"))
 
-            # Save the string as a local temporary file, then rewind so it can be read
-            f.write(bytes(s, 'utf-8'))
-            f.seek(0)
-
-            self.Log("STOR "+fname+"  from "+f.name)
-            try:
-                self.Log(self.g_ftp.storbinary("STOR "+fname, f))
-            except Exception as e:
-                Log(f"FTP.PutString(): FTP connection failure. Exception={e}")
-                if not self.Reconnect():
-                    return False
-                self.Log(self.g_ftp.storbinary("STOR "+fname, f))
-            return True
+        self.Log("STOR "+fname+"  from memory")
+        def stor() -> str:
+            f.seek(0)   # Rewind in case a failed attempt consumed part of the buffer
+            return self.g_ftp.storbinary("STOR "+fname, f, blocksize=FTP.g_blocksize)
+        try:
+            self.Log(self._WithRetry(stor))
+        except Exception as e:
+            Log(f"FTP.PutString(): STOR failed. Exception={e}")
+            return False
+        self._NlstCacheAdd(fname)
+        return True
 
 
     #-------------------------------
@@ -434,40 +877,153 @@ class FTP:
             Log("FTP.AppendString(): FTP not initialized")
             return False
 
-        with tempfile.TemporaryFile() as f:
-
-            # Save the string as a local temporary file, then rewind so it can be read
-            f.write(bytes(s, 'utf-8'))
-            f.seek(0)
+        # Wrap the string in an in-memory buffer -- no need to round-trip it through the disk
+        f=io.BytesIO(s.encode("utf-8"))
 
-            self.Log("STOR "+fname+"  from "+f.name)
-            try:
-                self.Log(self.g_ftp.storbinary("APPE "+fname, f))
-            except Exception as e:
-                Log(f"FTP.AppendString(): FTP connection failure. Exception={e}")
-                if not self.Reconnect():
-                    return False
-                self.Log(self.g_ftp.storbinary("APPE "+fname, f))
-            return True
+        self.Log("APPE "+fname+"  from memory")
+        # No retry for appends: a mid-transfer failure may have committed part of the payload on
+        # the server, and re-sending the whole buffer would append a duplicate copy on top of it.
+        # One attempt; failure is reported to the caller.
+        try:
+            self.Log(self.g_ftp.storbinary("APPE "+fname, f, blocksize=FTP.g_blocksize))
+        except Exception as e:
+            Log(f"FTP.AppendString(): APPE failed. Exception={e}")
+            return False
+        self._NlstCacheAdd(fname)
+        return True
 
 
     #-------------------------------
     # Copy the string s to fanac.org as a file <fname> in directory <directory>, creating directories as needed.
     def PutFileAsString(self, directory: str, fname: str, s: str, create: bool=False) -> bool:
         FTP._lastMessage=""  # Clear the last message
-        if not FTP().SetDirectory(directory, Create=create):
+        if not self.SetDirectory(directory, Create=create):
             Log("FTP.PutFieAsString(): Bailing out...")
             return False
-        return FTP().PutString(fname, s)
+        return self.PutString(fname, s)
+
+    #-------------------------------
+    # Upload many small strings into the same directory in one batch.  See PutFiles for the mechanics.
+    # items is a list of (filename, contents) pairs.  Returns True only if every upload succeeded.
+    def PutManyStrings(self, directory: str, items: list[tuple[str, str]], create: bool=False) -> bool:
+        return self.PutFiles(directory, [(fname, s.encode("utf-8")) for fname, s in items], create=create)
+
+
+    #-------------------------------
+    # Upload many files into the same directory in one batch.
+    # The directory change and the TYPE I setup happen once for the whole batch instead of once per file,
+    # so each additional file costs only its own STOR -- for many small files that's the dominant saving.
+    # items is a list of (filename, source) pairs, where source is either the bytes to upload or the
+    # path of a local file to read them from.  Returns True only if every upload succeeded.
+    def PutFiles(self, directory: str, items: list[tuple[str, bytes|str]], create: bool=False) -> bool:
+        FTP._lastMessage=""  # Clear the last message
+        if self.g_ftp is None:
+            Log("FTP.PutFiles(): FTP not initialized")
+            return False
+
+        if not self.SetDirectory(directory, Create=create):
+            Log("FTP.PutFiles(): Bailing out...")
+            return False
+
+        try:
+            self.g_ftp.voidcmd("TYPE I")
+            FTP.g_typeBinary=True
+        except Exception as e:
+            Log(f"FTP.PutFiles(): TYPE I failed. Exception={e}")
+            if not self.Reconnect():
+                return False
+            self.g_ftp.voidcmd("TYPE I")
+            FTP.g_typeBinary=True
+
+        ok=True
+        for fname, source in items:
+            data=source
+            if isinstance(source, str):     # A str source is a local pathname
+                try:
+                    with open(source, "rb") as f:
+                        data=f.read()
+                except OSError as e:
+                    Log(f"FTP.PutFiles(): could not read '{source}'. Exception={e}")
+                    ok=False
+                    continue
+            try:
+                # transfercmd rather than storbinary so we don't re-send TYPE I for every file
+                conn=self.g_ftp.transfercmd("STOR "+fname)
+                try:
+                    conn.sendall(data)
+                    if isinstance(conn, ssl.SSLSocket):
+                        conn.unwrap()       # Shut the TLS data channel down cleanly, as storbinary does
+                finally:
+                    conn.close()
+                self.Log(f"PutFiles: STOR {fname}: {self.g_ftp.voidresp()}")
+            except Exception as e:
+                Log(f"FTP.PutFiles(): STOR {fname} failed. Exception={e}")
+                # Retry through the reconnecting slow path
+                try:
+                    self.Log(self._WithRetry(lambda d=data, fn=fname: self.g_ftp.storbinary("STOR "+fn, io.BytesIO(d), blocksize=FTP.g_blocksize)))
+                except Exception as e:
+                    Log(f"FTP.PutFiles(): retry of {fname} failed. Exception={e}")
+                    ok=False
+                    continue
+                self._NlstCacheAdd(fname)
+            else:
+                self._NlstCacheAdd(fname)
+        return ok
+
+
+    #-------------------------------
+    # Upload many files concurrently, spreading them across the spare-connection pool.
+    # ftplib connections are not thread-safe, so each worker thread borrows its own connection and
+    # all of its uploads go through that one connection.  <directory> must be an absolute path.
+    # Returns True only if every upload succeeded.
+    def PutFilesConcurrent(self, directory: str, items: list[tuple[str, bytes|str]], create: bool=False, maxworkers: int=None) -> bool:
+        FTP._lastMessage=""  # Clear the last message
+        if len(items) == 0:
+            return True
+        if maxworkers is None:
+            maxworkers=FTP.g_poolsize
+        maxworkers=max(1, min(maxworkers, len(items)))
+        if maxworkers == 1:
+            return self.PutFiles(directory, items, create=create)
+
+        # Make sure the target directory exists (and create it if asked) before the workers pile in
+        if not self.SetDirectory(directory, Create=create):
+            Log("FTP.PutFilesConcurrent(): Bailing out...")
+            return False
+
+        def worker(chunk: list[tuple[str, bytes|str]]) -> bool:
+            ftp=self._AcquireConnection()
+            if ftp is None:
+                Log("FTP.PutFilesConcurrent(): no connection available for worker")
+                return False
+            ok=True
+            try:
+                ftp.cwd(directory)
+                ftp.voidcmd("TYPE I")
+                for fname, source in chunk:
+                    data=source
+                    if isinstance(source, str):     # A str source is a local pathname
+                        with open(source, "rb") as f:
+                            data=f.read()
+                    ftp.storbinary("STOR "+fname, io.BytesIO(data), blocksize=FTP.g_blocksize)
+            except Exception as e:
+                Log(f"FTP.PutFilesConcurrent(): worker failed. Exception={e}")
+                ok=False
+            finally:
+                self._ReleaseConnection(ftp)
+            return ok
+
+        chunks=[items[i::maxworkers] for i in range(maxworkers)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=maxworkers) as executor:
+            results=list(executor.map(worker, chunks))
+        self._FlushNlstCache(directory)
+        return all(results)
+
 
     # -------------------------------
     # Return True if a message is recognized as an FTP success message; False otherwise
     def IsSuccess(self, ret: str) -> bool:
-        successMessages=[
-            "226-File successfully transferred",
-        ]
-        ret=ret.split("\n")[0]      # Just want the 1st line if there are many
-        return any([x == ret for x in successMessages])
+        return _ReplyCode(ret) == 226   # Any 226 wording means the transfer completed
 
 
     #-------------------------------
@@ -484,27 +1040,79 @@ class FTP:
             Log("FTP.CopyAndRenameFile(): FTP not initialized", isError=True)
             return False
 
-        Log(f"CopyAndRenameFile: {oldpathname=} {oldfilename=} {newpathname=} {newfilename=}")
+        self.Log(f"CopyAndRenameFile: {oldpathname=} {oldfilename=} {newpathname=} {newfilename=}")
+
+        if newfilename is None:
+            newfilename=oldfilename
+
+        # First try a server-side copy: SITE CPFR/CPTO (ProFTPD mod_copy and friends) copies the file entirely
+        # on the server, so nothing needs to be downloaded and re-uploaded through us at all.
+        # The first failure with "command unknown" turns this off for the rest of the session.
+        if FTP.g_supportsSiteCopy is not False:
+            try:
+                self.g_ftp.voidcmd(f"SITE CPFR {oldpathname}/{oldfilename}")
+                self.g_ftp.voidcmd(f"SITE CPTO {newpathname}/{newfilename}")
+                FTP.g_supportsSiteCopy=True
+                self._FlushNlstCache(newpathname)
+                self.Log(f"CopyAndRenameFile: server-side copy to '{newpathname}/{newfilename}' succeeded")
+                return True
+            except error_perm as e:
+                if FTP.g_supportsSiteCopy is None and str(e)[:3] in ("500", "502"):
+                    FTP.g_supportsSiteCopy=False    # The server doesn't know the command; don't probe again
+                # Otherwise the source or target path may just be bad -- fall through to the
+                # download/upload path, which has the error handling for those cases.
+            except Exception as e:
+                self.Log(f"CopyAndRenameFile: SITE CPFR/CPTO failed ({e}); falling back to download/upload")
+
+        # When the destination already exists and a spare connection is available, stream the copy:
+        # the download and the upload run at the same time and only a few blocks are ever in
+        # memory.  Any trouble at all falls back to the buffered copy below, which has all the
+        # error handling.
+        if posixpath.isabs(newpathname) and self.PathExists(newpathname):
+            self.CWD(oldpathname)
+            if self._StreamCopy(oldfilename, newpathname, newfilename):
+                self._FlushNlstCache(newpathname)
+                return True
 
         self.CWD(oldpathname)
 
-        # The lambda callback in retrbinary will accumulate bytes here
-        temp: bytearray=bytearray(0)
+        # RETR accumulates into this buffer, which is later rewound and handed straight to STOR,
+        # so the payload exists only once rather than being copied into a second object.  Small
+        # files stay in memory; anything past 16 MB spills to disk instead of ballooning the RSS.
+        # When the server can tell us the size up front (one SIZE round trip), start the buffer in
+        # the right mode: a big file goes straight to disk rather than filling 16 MB of memory and
+        # then copying it all out again when the spool rolls over mid-transfer.
+        size=None
+        if "SIZE" in FTP.g_feats:
+            try:
+                if not FTP.g_typeBinary:
+                    self.g_ftp.voidcmd("TYPE I")    # Many servers refuse SIZE in ASCII mode
+                    FTP.g_typeBinary=True
+                size=self.g_ftp.size(oldfilename)
+            except Exception as e:
+                self.Log(f"CopyAndRenameFile: SIZE failed ({e})")
+        if size is not None and size > 16<<20:
+            buf=tempfile.TemporaryFile()
+        else:
+            buf=tempfile.SpooledTemporaryFile(max_size=16<<20)
 
         self.Log(f"RETR '{oldfilename}' from '{oldpathname}'")
-        ret="No message returned by retrbinary()"
+        def retr() -> str:
+            buf.seek(0)
+            buf.truncate()      # Don't let a partial first transfer duplicate data
+            return self.g_ftp.retrbinary(f"RETR {oldfilename.replace(' ', '%20')}", buf.write, blocksize=FTP.g_blocksize)
         try:
-            ret=self.g_ftp.retrbinary(f"RETR {oldfilename.replace(' ', '%20')}", lambda data: temp.extend(data))
+            ret=self._WithRetry(retr)
             self.Log(ret)
         except error_perm as e:
-            Log(ret)
+            if _ReplyCode(str(e)) == 550:   # Only "no such file" qualifies as a missing file to ignore
+                Log(f"FTP.CopyAndRenameFile().retrbinary(): '{oldfilename}' does not exist. Exception={e}", isError=True)
+                return IgnoreMissingFile
             Log(f"FTP.CopyAndRenameFile().retrbinary(): Exception={e}", isError=True)
-            if not self.Reconnect():
-                if IgnoreMissingFile:
-                    return True
-                return False
-            ret=self.g_ftp.retrbinary(f"RETR {oldfilename}", lambda data: temp.extend(data))
-            self.Log(ret)
+            return False
+        except Exception as e:
+            Log(f"FTP.CopyAndRenameFile().retrbinary(): Exception={e}", isError=True)
+            return False
 
         if not self.IsSuccess(ret):
             Log(ret, isError=True)
@@ -520,37 +1128,120 @@ class FTP:
             self.MKD(newpathname)
         self.CWD(newpathname)
 
-        if newfilename is None:
-            newfilename=oldfilename
-
+        def stor() -> str:
+            buf.seek(0)     # Rewind in case a failed attempt consumed part of the buffer
+            return self.g_ftp.storbinary(f"STOR {newfilename}", buf, blocksize=FTP.g_blocksize)
         try:
-            ret=self.g_ftp.storbinary(f"STOR {newfilename}", io.BytesIO(temp))
+            ret=self._WithRetry(stor)
             self.Log(ret)
         except Exception as e:
-            Log(f"FTP.CopyAndRenameFile().PutFile(): FTP connection failure. Exception={e}")
-            if not self.Reconnect():
-                return False
-            ret=self.g_ftp.storbinary(f"STOR {newfilename}", io.BytesIO(temp))
-            self.Log(ret)
+            Log(f"FTP.CopyAndRenameFile(): STOR failed. Exception={e}")
+            return False
+        self._NlstCacheAdd(newfilename)
         return True
 
 
+    #-------------------------------
+    # Stream a file from the current directory to another directory by overlapping the transfers:
+    # g_ftp RETRs blocks into a small bounded queue while a borrowed pool connection STORs them out
+    # the other side.  The upload finishes shortly after the download does instead of only starting
+    # then, and only a few blocks are ever resident at once.
+    # Returns False for any trouble at all -- the caller falls back to the buffered copy.
+    def _StreamCopy(self, fromname: str, topath: str, toname: str) -> bool:
+        dest=self._AcquireConnection()
+        if dest is None:
+            return False
+        ok=False
+        try:
+            dest.cwd(topath)
+            dest.voidcmd("TYPE I")
+            chunks=queue.Queue(maxsize=8)   # Bounds memory to a few blocks and lets a slow STOR backpressure the RETR
+            retrerr=[]
+
+            def retr() -> None:
+                try:
+                    self.g_ftp.retrbinary(f"RETR {fromname.replace(' ', '%20')}", chunks.put, blocksize=FTP.g_blocksize)
+                except Exception as e:
+                    retrerr.append(e)
+                finally:
+                    chunks.put(None)    # EOF marker; sent on error too so the reader can't hang
+
+            class _QueueReader:
+                # The minimal file-like surface storbinary needs: read() returning b"" at EOF
+                def __init__(self, primed: bytes|None):
+                    self.primed=primed      # The first chunk, already pulled off the queue below
+                def read(self, n: int=-1) -> bytes:
+                    if self.primed is not None:
+                        chunk, self.primed=self.primed, None
+                        return chunk
+                    chunk=chunks.get()
+                    if chunk is None:
+                        chunks.put(None)    # Leave the marker in place for any further read
+                        return b""
+                    return chunk
+
+            t=threading.Thread(target=retr, daemon=True)
+            t.start()
+
+            # Don't open the STOR until the download has actually produced something: a RETR which
+            # fails outright (e.g., a missing source file) must not leave an empty destination behind.
+            first=chunks.get()
+            if first is None:
+                t.join()
+                if len(retrerr) > 0:
+                    self.Log(f"_StreamCopy: RETR failed. Exception={retrerr[0]}")
+                    return False
+                chunks.put(None)    # A genuinely empty source file; restore the EOF marker for the reader
+
+            try:
+                msg=dest.storbinary("STOR "+toname, _QueueReader(first), blocksize=FTP.g_blocksize)
+            finally:
+                # Make sure the downloader can finish even if the upload died mid-stream
+                while t.is_alive():
+                    try:
+                        chunks.get_nowait()
+                    except queue.Empty:
+                        t.join(0.1)
+                t.join()
+            if len(retrerr) > 0:
+                # The RETR died partway, so whatever the STOR wrote is truncated -- remove it
+                # rather than leave a short file masquerading as the real thing.
+                self.Log(f"_StreamCopy: RETR failed mid-transfer. Exception={retrerr[0]}")
+                try:
+                    dest.delete(toname)
+                except Exception as e:
+                    self.Log(f"_StreamCopy: could not remove partial '{toname}' ({e})")
+                return False
+            self.Log(msg)
+            ok=_ReplyCode(msg) == 226
+            return ok
+        except Exception as e:
+            self.Log(f"_StreamCopy: failed ({e}); falling back to buffered copy")
+            return False
+        finally:
+            if ok:
+                self._ReleaseConnection(dest)
+            else:
+                # The connection may be wedged mid-transfer; don't put it back in the pool
+                try:
+                    dest.close()
+                except Exception:
+                    pass
+
+
     #-------------------------------
     # Make a timestamped copy of a file on the server
     # If the file does not exist, return True.
     # For other failures, return False
     def BackupServerFile(self, pathname) -> bool:
         FTP._lastMessage=""  # Clear the last message
-        path, filename=os.path.split(pathname)
-        if not FTP().SetDirectory(path, Create=True):
+        path, filename=posixpath.split(pathname)    # A server path, so never use the host OS's path rules on it
+        if not self.SetDirectory(path, Create=True):
             Log(f"FTP.BackupServerFile(): Could not set directory to '{path}'")
             return False
         path=path.replace("//", "/")
-        try:
-            return FTP().CopyAndRenameFile(path, filename, path, TimestampFilename(filename))
-        except error_perm as e:
-            Log(f"BackupServerFile('{pathname}'): could not read file to be backed up.  Will assume there is nothing needing backup.")
-        return True
+        # IgnoreMissingFile keeps the contract: a file which isn't there has nothing needing backup
+        return self.CopyAndRenameFile(path, filename, path, TimestampFilename(filename), IgnoreMissingFile=True)
 
 
 
@@ -565,17 +1256,19 @@ class FTP:
         self.Log("STOR "+toname+"  from "+pathname)
         try:
             with open(pathname, "rb") as f:
+                def stor() -> str:
+                    f.seek(0)   # Rewind in case a failed attempt consumed part of the file
+                    return self.g_ftp.storbinary("STOR "+toname, f, blocksize=FTP.g_blocksize)
                 try:
-                    self.Log(self.g_ftp.storbinary("STOR "+toname, f))
+                    self.Log(self._WithRetry(stor))
                 except Exception as e:
-                    Log("FTP.PutFile(): FTP connection failure. Exception="+str(e))
-                    if not self.Reconnect():
-                        return False
-                    self.Log(self.g_ftp.storbinary("STOR "+toname, f))
-        except Exception as e:
+                    Log("FTP.PutFile(): STOR failed. Exception="+str(e))
+                    return False
+        except OSError as e:
             Log(f"FTP.PutFile(): Exception on Open('{pathname}', 'rb') ")
             Log(str(e))
             return False
+        self._NlstCacheAdd(toname)
         return True
 
 
@@ -587,34 +1280,31 @@ class FTP:
             Log("FTP.GetAsString(): FTP not initialized")
             return None
 
-        fd=tempfile.TemporaryDirectory()
-        self.Log("RETR "+fname+"  to "+fd.name)
-        if not self.FileExists(fname):
-            Log(f"FTP.GetAsString(): '{fname}' does not exist.")
-            fd.cleanup()
-            return None
-        # Download the file into the temporary file
-        tempfname=os.path.join(fd.name, "tempfile")
-        f=open(tempfname, "wb+")
+        self.Log("RETR "+fname+"  to memory")
+        # No pre-flight existence check: that costs a listing round trip, and a 550 from RETR
+        # itself tells us the same thing.
+        # Download the file straight into an in-memory buffer
+        buf=bytearray()
+        def retr() -> str:
+            buf.clear()     # Don't let a partial first transfer duplicate data
+            return self.g_ftp.retrbinary("RETR "+fname, buf.extend, blocksize=FTP.g_blocksize)
         try:
-            msg=self.g_ftp.retrbinary("RETR "+fname, f.write)
-        except Exception as e:
-            Log(f"FTP.GetAsString(): FTP connection failure. Exception={e}")
-            if not self.Reconnect():
-                fd.cleanup()
+            msg=self._WithRetry(retr)
+        except error_perm as e:
+            if str(e).startswith("550"):
+                Log(f"FTP.GetAsString(): '{fname}' does not exist.")
                 return None
-            msg=self.g_ftp.retrbinary("RETR "+fname, f.write)
+            Log(f"FTP.GetAsString(): RETR failed. Exception={e}")
+            return None
+        except Exception as e:
+            Log(f"FTP.GetAsString(): RETR failed. Exception={e}")
+            return None
         self.Log(msg)
-        if not msg.startswith("226"):
+        if _ReplyCode(msg) != 226:
             Log("FTP.GetAsString(): failed")
-            fd.cleanup()
             return None
 
-        with open(tempfname, "r", encoding='utf8') as f:
-            out=f.readlines()
-        out="".join(out)    # Rejoin into a string
-        fd.cleanup()
-        return out
+        return buf.decode("utf-8")
 
 
     #-------------------------------
@@ -627,59 +1317,77 @@ class FTP:
             else:
                 Log(f"***GetFileAsString(): SetDirectory('{directory}') failed. Bailing out...")
             return None
-        s=FTP().GetAsString(fname)
+        s=self.GetAsString(fname)
         if s is None:
             Log(f"***FTP.GetFileAsString(): Could not load '{directory}/{fname}'")
         return s
 
 
     #-------------------------------
-    def Nlst(self, directory: str) -> list[str]:
+    # Return the contents of <directory> as a list of (name, facts) tuples using MLSD (RFC 3659), which supplies
+    # each entry's type (file vs dir), size, etc., in a single listing -- no follow-up probe needed per entry.
+    # On servers without MLSD we fall back to NLST and the facts dicts are empty.
+    def Mlsd(self, directory: str) -> list[tuple[str, dict]]:
         FTP._lastMessage=""  # Clear the last message
         if self.g_ftp is None:
-            Log("FTP.Nlst(): FTP not initialized")
+            Log("FTP.Mlsd(): FTP not initialized")
             return []
 
         if not self.SetDirectory(directory):
-            Log("FTP.Nlst(): Bailing out...")
+            Log("FTP.Mlsd(): Bailing out...")
             return []
 
-        return [x for x in self.g_ftp.nlst() if x != "." and x != ".."] # Ignore the . and .. elements
+        if "MLST" in FTP.g_feats:   # Servers advertise MLSD support via the MLST feature
+            try:
+                FTP.g_typeBinary=False      # mlsd rides on retrlines, which quietly switches the connection to TYPE A
+                return [(name, facts) for name, facts in self.g_ftp.mlsd() if name not in (".", "..")]
+            except Exception as e:
+                self.Log(f"FTP.Mlsd('{directory}'): MLSD failed ({e}); falling back to NLST")
+
+        try:
+            FTP.g_typeBinary=False      # So is nlst
+            names=self._WithRetry(lambda: self.g_ftp.nlst())
+        except Exception as e:
+            Log(f"FTP.Mlsd(): NLST failed. Exception={e}")
+            return []
+        return [(name, {}) for name in names if name not in (".", "..")] # Ignore the . and .. elements
+
+
+    #-------------------------------
+    def Nlst(self, directory: str) -> list[str]:
+        return [name for name, _ in self.Mlsd(directory)]
 
 
 #============================================================
 # A class to maintain acrude locking system on an FTP server
 # Note that an FTP link must already be set up.
 class Lock:
+    _ftp: FTP=FTP()     # FTP state is all class-level, so one shared instance serves every Lock
 
-    # Lock returns False if there is already a lock in place; returns True and sets a lock if there is no lock or the lock has expired
+    # Returns "" and sets a lock if there is no lock, the lock is our own, or the lock has expired.
+    # Returns a description of the holder if someone else holds a live lock.
     def SetLock(self, path: str, id: str) -> str:
 
+        # One read tells us everything about any existing lock: hands off if it's someone else's and still fresh
         lockid, lockdate=self.GetLock(path)
-        if lockid == "":
-            # There is none. So set a lock for me
-            self.MakeLock(path, id)
-            return ""
-
-        # If a lock exists, but is my own id or is a blank id, we always override it and write a new lock.
-        if lockid == id or lockid == "":
-            self.MakeLock(path, id)
-            return ""
-
-        # If it's not my lock, see if it has expired
-        lockdate=datetime.strptime(lockdate, '%Y-%m-%d %H:%M:%S')
-        if datetime.now()-lockdate > timedelta(hours=12):
-            # It has expired -- override it
-            self.MakeLock(path, id)
-            return ""
-
-        # OK, it's locked by someone else
-        return f"Locked by {lockid} on {lockdate:%Y-%m-%d} at {lockdate:%H:%M:%S}"
+        if lockid != "" and lockid != id:
+            lockdate=datetime.strptime(lockdate, '%Y-%m-%d %H:%M:%S')
+            if datetime.now()-lockdate <= timedelta(hours=12):
+                # OK, it's locked by someone else
+                return f"Locked by {lockid} on {lockdate:%Y-%m-%d} at {lockdate:%H:%M:%S}"
+
+        # No lock, our own lock, or an expired one: take it with a single STOR and read it back, so
+        # a race with another taker is detected rather than silently won by both sides.
+        self.MakeLock(path, id)
+        lockid, lockdate=self.GetLock(path)
+        if lockid != id:
+            return f"Locked by {lockid} on {lockdate}"
+        return ""
 
 
     def GetLock(self, path: str) -> tuple[str, str]:
         # Get any  existing lock
-        lock=FTP().GetAsString(f"/{path}/Lock")
+        lock=self._ftp.GetAsString(f"/{path}/Lock")
         if lock is None or lock == "":
             return ("", "")
         # There is an existing lock.  Extract the ID and datetime
@@ -688,7 +1396,7 @@ class Lock:
 
 
     def MakeLock(self, path: str, id: str):
-        if not FTP().PutString(f"/{path}/Lock", f"{id}={datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"):
+        if not self._ftp.PutString(f"/{path}/Lock", f"{id}={datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"):
             LogError(f"SetLock('{path}', '{id}') failed")
             raise Exception(f"SetLock('{path}', '{id}') failed")
 
@@ -697,7 +1405,7 @@ class Lock:
     # True indicates lock released (or never existed)
     # False indicates Classic is locked by someone else
     def ReleaseLock(self, path: str, id: str) -> bool:
-        lock=FTP().GetAsString(path+"/Lock")
+        lock=self._ftp.GetAsString(path+"/Lock")
 
         if lock is None:
             return True
@@ -706,7 +1414,7 @@ class Lock:
 
         # If it's my own lock, we always override it.  Otherwise, we always leave it.
         if lockid == id:
-            if FTP().DeleteFile(path+"/Lock"):
+            if self._ftp.DeleteFile(path+"/Lock"):
                 return True
 
         return False